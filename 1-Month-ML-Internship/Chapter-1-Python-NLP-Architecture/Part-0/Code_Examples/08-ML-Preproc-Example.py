@@ -1,5 +1,10 @@
 # Simple ML Data Preprocessing Example
 
+import numpy as np
+
+from columnar import ColumnarDataset
+from scalers import MinMaxScaler, StandardScaler
+
 # Sample data
 data = {
     "names": ["Alice", "Bob", "Charlie"],
@@ -8,34 +13,26 @@ data = {
 }
 
 # Normalize scores (0-1 range)
-min_score = min(data["scores"])
-max_score = max(data["scores"])
-
-normalized_scores = [
-    (score - min_score) / (max_score - min_score) 
-    for score in data["scores"]
-]
+# The fitted scaler keeps min/max, so new data reuses the training range
+score_scaler = MinMaxScaler().fit(data["scores"])
+normalized_scores = score_scaler.transform(data["scores"]).tolist()
 
 print("Original scores:", data["scores"])
 print("Normalized scores:", normalized_scores)
 
-# Feature scaling using z-score
-import statistics
-mean = statistics.mean(data["ages"])
-std = statistics.stdev(data["ages"])
-
-z_scores = [(age - mean) / std for age in data["ages"]]
+# Feature scaling using z-score (ddof=1 matches statistics.stdev)
+age_scaler = StandardScaler(ddof=1).fit(data["ages"])
+z_scores = age_scaler.transform(data["ages"]).tolist()
 print("Z-scores for ages:", z_scores)
 
-# Create labeled dataset
-dataset = []
-for i in range(len(data["names"])):
-    dataset.append({
-        "name": data["names"][i],
-        "age": data["ages"][i],
-        "score": normalized_scores[i],
-        "label": "high" if normalized_scores[i] > 0.5 else "low"
-    })
+# Create labeled dataset: one typed array per column, label derived
+# from the whole score column at once
+dataset = ColumnarDataset({
+    "name": data["names"],
+    "age": data["ages"],
+    "score": normalized_scores,
+})
+dataset["label"] = np.where(dataset["score"] > 0.5, "high", "low")
 
 for record in dataset:
     print(record)
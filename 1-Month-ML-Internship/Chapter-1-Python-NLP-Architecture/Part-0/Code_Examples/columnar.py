@@ -0,0 +1,105 @@
+# Columnar dataset
+#
+# Stores a labeled dataset as one typed NumPy array per column instead
+# of one dict per row. Derived columns are computed on whole columns,
+# rows and slices are views into the arrays (no copies), and datasets
+# save to a folder of .npy files that load back memory-mapped.
+
+import json
+import os
+
+import numpy as np
+
+
+class Row:
+    """Read-only view of one row; values are read from the columns."""
+
+    __slots__ = ("_dataset", "_index")
+
+    def __init__(self, dataset, index):
+        self._dataset = dataset
+        self._index = index
+
+    def __getitem__(self, name):
+        return self._dataset.columns[name][self._index]
+
+    def as_dict(self):
+        return {name: column[self._index].item()
+                for name, column in self._dataset.columns.items()}
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class ColumnarDataset:
+    """Equal-length typed columns with row, slice and batch access."""
+
+    def __init__(self, columns):
+        self.columns = {}
+        for name, values in columns.items():
+            self[name] = values
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from a list of dicts (one pass per column)."""
+        names = list(records[0]) if records else []
+        return cls({name: [r[name] for r in records] for name in names})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    def __setitem__(self, name, values):
+        """Add or replace a column, e.g. a vectorized derived column."""
+        values = np.asarray(values)
+        if values.ndim != 1:
+            raise ValueError(f"Column {name!r} must be one-dimensional")
+        if self.columns and len(values) != len(self):
+            raise ValueError(f"Column {name!r} has {len(values)} rows, "
+                             f"expected {len(self)}")
+        self.columns[name] = values
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return ColumnarDataset({name: column[key]
+                                    for name, column in self.columns.items()})
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("row index out of range")
+        return Row(self, key)
+
+    def __iter__(self):
+        return (Row(self, i) for i in range(len(self)))
+
+    def iter_batches(self, batch_size):
+        """Yield consecutive slices of at most batch_size rows (views)."""
+        for start in range(0, len(self), batch_size):
+            yield self[start:start + batch_size]
+
+    def save(self, directory):
+        """One <column>.npy per column plus columns.json for the order."""
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self.columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), column)
+        with open(os.path.join(directory, "columns.json"), "w", encoding="utf-8") as f:
+            json.dump(self.column_names, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved dataset; with mmap=True columns are read lazily."""
+        with open(os.path.join(directory, "columns.json"), encoding="utf-8") as f:
+            names = json.load(f)
+        mode = "r" if mmap else None
+        return cls({name: np.load(os.path.join(directory, f"{name}.npy"),
+                                  mmap_mode=mode)
+                    for name in names})
+
+    def __repr__(self):
+        types = ", ".join(f"{n}: {c.dtype}" for n, c in self.columns.items())
+        return f"ColumnarDataset({len(self)} rows; {types})"
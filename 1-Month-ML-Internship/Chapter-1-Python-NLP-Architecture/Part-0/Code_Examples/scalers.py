@@ -0,0 +1,144 @@
+# Fitted feature scalers
+#
+# Fit once on training data (in batches if it doesn't fit in memory),
+# save the fitted statistics, and reuse them at inference time instead
+# of recomputing min/max or mean/std on every call.
+# Constant columns scale to 0 instead of dividing by zero.
+
+import json
+
+import numpy as np
+
+
+def _as_2d(X):
+    """Accept a list, a 1-D column or a 2-D (rows, columns) array."""
+    X = np.asarray(X, dtype=np.float64)
+    return X.reshape(-1, 1) if X.ndim == 1 else X
+
+
+class Scaler:
+    """Shared transform/save logic: x_scaled = (x - offset) / scale."""
+
+    def __init__(self):
+        self.offset_ = None
+        self.scale_ = None
+
+    def fit(self, X):
+        self._reset()
+        return self.partial_fit(X)
+
+    def _check_fitted(self):
+        if self.offset_ is None:
+            raise ValueError(f"{type(self).__name__} is not fitted yet")
+
+    def transform(self, X):
+        self._check_fitted()
+        X = np.asarray(X, dtype=np.float64)
+        out = (_as_2d(X) - self.offset_) / self.scale_
+        return out.reshape(X.shape)
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        self._check_fitted()
+        X = np.asarray(X, dtype=np.float64)
+        out = _as_2d(X) * self.scale_ + self.offset_
+        return out.reshape(X.shape)
+
+    def save(self, path):
+        """Write the fitted statistics as JSON."""
+        self._check_fitted()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"type": type(self).__name__, **self._state()}, f)
+
+
+class MinMaxScaler(Scaler):
+    """Scales each column to [0, 1] using the min/max seen while fitting."""
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self.min_ = None
+        self.max_ = None
+
+    def partial_fit(self, X):
+        X = _as_2d(X)
+        if self.min_ is None:
+            self.min_, self.max_ = X.min(axis=0), X.max(axis=0)
+        else:
+            self.min_ = np.minimum(self.min_, X.min(axis=0))
+            self.max_ = np.maximum(self.max_, X.max(axis=0))
+        self._update_scale()
+        return self
+
+    def _update_scale(self):
+        data_range = self.max_ - self.min_
+        self.offset_ = self.min_
+        self.scale_ = np.where(data_range == 0, 1.0, data_range)
+
+    def _state(self):
+        return {"min": self.min_.tolist(), "max": self.max_.tolist()}
+
+
+class StandardScaler(Scaler):
+    """Z-scores each column; ddof=1 matches statistics.stdev."""
+
+    def __init__(self, ddof=0):
+        super().__init__()
+        self.ddof = ddof
+        self._reset()
+
+    def _reset(self):
+        self.n_ = 0
+        self.mean_ = None
+        self.m2_ = None  # per-column sum of squared deviations
+
+    def partial_fit(self, X):
+        X = _as_2d(X)
+        n = len(X)
+        if n == 0:
+            return self
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        if self.n_ == 0:
+            self.mean_, self.m2_ = batch_mean, batch_m2
+        else:
+            # Chan et al. update: combine running and batch moments
+            total = self.n_ + n
+            delta = batch_mean - self.mean_
+            self.mean_ = self.mean_ + delta * n / total
+            self.m2_ = self.m2_ + batch_m2 + delta ** 2 * self.n_ * n / total
+        self.n_ += n
+        self._update_scale()
+        return self
+
+    def _update_scale(self):
+        std = np.sqrt(self.m2_ / max(self.n_ - self.ddof, 1))
+        self.offset_ = self.mean_
+        self.scale_ = np.where(std == 0, 1.0, std)
+
+    def _state(self):
+        return {"ddof": self.ddof, "n": self.n_,
+                "mean": self.mean_.tolist(), "m2": self.m2_.tolist()}
+
+
+def load_scaler(path):
+    """Rebuild a scaler written by save()."""
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state["type"] == "MinMaxScaler":
+        scaler = MinMaxScaler()
+        scaler.min_ = np.array(state["min"])
+        scaler.max_ = np.array(state["max"])
+    elif state["type"] == "StandardScaler":
+        scaler = StandardScaler(ddof=state["ddof"])
+        scaler.n_ = state["n"]
+        scaler.mean_ = np.array(state["mean"])
+        scaler.m2_ = np.array(state["m2"])
+    else:
+        raise ValueError(f"Unknown scaler type: {state['type']}")
+    scaler._update_scale()
+    return scaler
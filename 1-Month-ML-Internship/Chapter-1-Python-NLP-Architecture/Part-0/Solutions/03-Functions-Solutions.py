@@ -1,6 +1,7 @@
 # 03-Functions-Solutions.py - SOLUTIONS
 
 import math
+import re
 import string
 
 # Solution 1: Circle Area
@@ -20,12 +21,18 @@ print(clean_text("  HELLO WORLD!!!  "))
 def normalize_list(values):
     min_val = min(values)
     max_val = max(values)
-    return [(x - min_val) / (max_val - min_val) for x in values]
+    value_range = max_val - min_val
+    if value_range == 0:
+        return [0.0 for x in values]  # constant data: avoid dividing by zero
+    return [(x - min_val) / value_range for x in values]
 
 print(normalize_list([10, 20, 30, 40]))
 
 # Solution 4: Email Validation
+# Same rules as validate_email in Part-01.1/Solutions/03-Text-NLP-Solutions.py
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
 def is_valid_email(email):
-    return "@" in email and "." in email.split("@")[1]
+    return EMAIL_PATTERN.fullmatch(email) is not None
 
 print(is_valid_email("user@example.com"))
@@ -2,21 +2,226 @@
 Solutions for Exercise Set 2: Advanced Python Patterns
 """
 
+import asyncio
+import codecs
+import inspect
+import io
+import itertools
+import json
+import mmap
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
 import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
 
+import numpy as np
+
+# ===== METRICS =====
+
+class LatencyMetric:
+    """Call count, total and an HDR-style histogram of latencies in ns
+    
+    Hot paths only append to a pending list (atomic under the GIL); the
+    samples are folded into the histogram under a lock every FOLD_EVERY
+    samples and on snapshot. Buckets keep SUB_BITS + 1 significant bits
+    of each value, so every bucket is within about 3% of its values.
+    """
+    SUB_BITS = 5
+    FOLD_EVERY = 4096
+    
+    def __init__(self, name, sample_every=1):
+        self.name = name
+        self.sample_every = sample_every
+        self.lock = threading.Lock()
+        self.pending = []
+        self.samples = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = {}  # (shift << 8) | top bits -> count
+    
+    def record(self, ns):
+        self.pending.append(ns)
+        if len(self.pending) >= self.FOLD_EVERY:
+            self.fold()
+    
+    def fold(self):
+        """Move pending samples into the histogram"""
+        with self.lock:
+            n = len(self.pending)
+            batch = self.pending[:n]
+            del self.pending[:n]
+            if not batch:
+                return
+            values = np.array(batch, dtype=np.int64)
+            bit_length = np.frexp(values.astype(np.float64))[1]
+            shift = np.maximum(bit_length - self.SUB_BITS - 1, 0)
+            keys, counts = np.unique((shift << 8) | (values >> shift),
+                                     return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                self.buckets[key] = self.buckets.get(key, 0) + count
+            self.samples += n
+            self.total_ns += int(values.sum())
+            self.max_ns = max(self.max_ns, int(values.max()))
+    
+    def percentile(self, p):
+        self.fold()
+        with self.lock:
+            buckets = sorted(self.buckets.items())
+            samples = self.samples
+        rank = p / 100 * samples
+        seen = 0
+        for key, count in buckets:
+            seen += count
+            if seen >= rank:
+                shift = key >> 8
+                midpoint = ((key & 0xFF) << shift) + (1 << shift) // 2
+                return min(midpoint, self.max_ns)
+        return 0
+    
+    def snapshot(self):
+        self.fold()
+        samples = self.samples
+        return {
+            "calls_est": samples * self.sample_every,
+            "samples": samples,
+            "mean_us": round(self.total_ns / samples / 1000, 3) if samples else 0,
+            "p50_us": self.percentile(50) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max_ns / 1000,
+        }
+
+class MetricsRegistry:
+    """Thread-safe collection of LatencyMetrics by name"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+    
+    def metric(self, name, sample_every=1):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = LatencyMetric(name, sample_every)
+            return self.metrics[name]
+    
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+REGISTRY = MetricsRegistry()
+
+def timed(name=None, sample_every=1, registry=REGISTRY):
+    """Decorator: record 1 in sample_every calls with perf_counter_ns"""
+    def decorator(func):
+        metric = registry.metric(name or func.__qualname__, sample_every)
+        clock = time.perf_counter_ns
+        pending = metric.pending
+        append = pending.append
+        limit = metric.FOLD_EVERY
+        
+        if sample_every == 1:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    append(clock() - start)
+                    if len(pending) >= limit:
+                        metric.fold()
+            return wrapper
+        
+        calls = itertools.count()
+        @wraps(func)
+        def sampled_wrapper(*args, **kwargs):
+            if next(calls) % sample_every:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                append(clock() - start)
+                if len(pending) >= limit:
+                    metric.fold()
+        return sampled_wrapper
+    return decorator
+
+@contextmanager
+def timed_block(name, registry=REGISTRY):
+    """Context manager version of timed for a block of code"""
+    metric = registry.metric(name)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        metric.record(time.perf_counter_ns() - start)
+
+class MetricsExporter:
+    """Writes a registry snapshot every interval seconds as a JSON line,
+    to a file (appended) or to stdout"""
+    def __init__(self, registry=REGISTRY, interval=10.0, path=None):
+        self.registry = registry
+        self.interval = interval
+        self.path = path
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def export(self):
+        line = json.dumps({"time": time.time(), "metrics": self.registry.snapshot()})
+        if self.path is None:
+            print(line, file=sys.stdout, flush=True)
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+    
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+    
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.export()  # final snapshot
+
+def benchmark_timed_overhead(n=200000):
+    """Added cost per call of timed, unsampled and sampled"""
+    def predict(text):
+        return "positive" if len(text) > 5 else "negative"
+    
+    variants = {
+        "bare": predict,
+        "timed": timed("bench.every")(predict),
+        "timed 1/100": timed("bench.sampled", sample_every=100)(predict),
+    }
+    base = None
+    for label, func in variants.items():
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            func("some text")
+        per_call = (time.perf_counter_ns() - start) / n
+        base = per_call if base is None else base
+        print(f"{label:>12}: {per_call:.0f} ns/call (+{per_call - base:.0f} ns)")
+
 # ===== BEGINNER SOLUTIONS =====
 
 def timer(func):
-    """Decorator that measures execution time"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        elapsed = time.time() - start
-        print(f"{func.__name__} took {elapsed:.4f}s")
-        return result
-    return wrapper
+    """Decorator that measures execution time
+    
+    Records into REGISTRY instead of printing, so it is cheap enough
+    to leave on; see REGISTRY.snapshot() or MetricsExporter.
+    """
+    return timed()(func)
 
 def fibonacci_gen(n):
     """Generator yielding fibonacci numbers"""
@@ -29,54 +234,747 @@ def fibonacci_gen(n):
 
 # ===== INTERMEDIATE SOLUTIONS =====
 
+# Read when a function is decorated: with python -O or VALIDATE_INPUTS=0
+# validate_input returns the function itself, so checks cost nothing.
+VALIDATE_INPUTS = __debug__ and os.environ.get("VALIDATE_INPUTS", "1") != "0"
+
+def _type_error(name, expected_type):
+    raise TypeError(f"{name} must be {expected_type}")
+
+def _compile_checker(func, type_checks):
+    """Generate a wrapper with one inline isinstance test per checked argument
+    
+    The signature is bound here, once: each name is mapped to its
+    position in *args and/or its key in **kwargs, so the generated code
+    has no loops, dict lookups of type_checks or signature binding.
+    """
+    params = inspect.signature(func).parameters
+    has_var_kwargs = any(p.kind is p.VAR_KEYWORD for p in params.values())
+    positional = [name for name, p in params.items()
+                  if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    
+    namespace = {"_func": func, "_fail": _type_error}
+    lines = ["def wrapper(*args, **kwargs):", "    n_args = len(args)"]
+    for i, (name, expected_type) in enumerate(type_checks.items()):
+        param = params.get(name)
+        if param is None and not has_var_kwargs:
+            raise TypeError(f"{func.__qualname__}() has no argument {name!r}")
+        t = f"_t{i}"
+        namespace[t] = expected_type
+        fail = f"_fail({name!r}, {t})"
+        by_keyword = param is None or param.kind is not param.POSITIONAL_ONLY
+        if name in positional:
+            index = positional.index(name)
+            lines += [f"    if n_args > {index}:",
+                      f"        if not isinstance(args[{index}], {t}): {fail}"]
+            if by_keyword:
+                lines += [f"    elif {name!r} in kwargs:",
+                          f"        if not isinstance(kwargs[{name!r}], {t}): {fail}"]
+        elif by_keyword:
+            lines += [f"    if {name!r} in kwargs and not isinstance(kwargs[{name!r}], {t}): {fail}"]
+    lines.append("    return _func(*args, **kwargs)")
+    exec("\n".join(lines), namespace)
+    return namespace["wrapper"]
+
 def validate_input(**type_checks):
-    """Decorator for input validation"""
+    """Decorator for input validation
+    
+    Checks positional and keyword arguments; defaults are not checked.
+    A no-op when VALIDATE_INPUTS is false.
+    """
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for key, expected_type in type_checks.items():
-                if key in kwargs and not isinstance(kwargs[key], expected_type):
-                    raise TypeError(f"{key} must be {expected_type}")
-            return func(*args, **kwargs)
-        return wrapper
+        if not VALIDATE_INPUTS:
+            return func
+        return wraps(func)(_compile_checker(func, type_checks))
     return decorator
 
+def benchmark_validate_input(n=200000):
+    """Per-call overhead of the old dict loop, the compiled checker and off"""
+    def loop_validate_input(**type_checks):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                for key, expected_type in type_checks.items():
+                    if key in kwargs and not isinstance(kwargs[key], expected_type):
+                        raise TypeError(f"{key} must be {expected_type}")
+                return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def handler(text, threshold=0.5):
+        return len(text) > threshold
+    
+    checks = {"text": str, "threshold": float}
+    variants = {
+        "bare / disabled": handler,
+        "dict loop": loop_validate_input(**checks)(handler),
+        "compiled": wraps(handler)(_compile_checker(handler, checks)),
+    }
+    base = None
+    for label, func in variants.items():
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            func("some text", threshold=0.7)
+        per_call = (time.perf_counter_ns() - start) / n
+        base = per_call if base is None else base
+        print(f"{label:>16}: {per_call:.0f} ns/call (+{per_call - base:.0f} ns)")
+
+BOMS = [  # longest first: the UTF-32 LE BOM starts with the UTF-16 LE one
+    (codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+def sniff_encoding(prefix, fallback='latin-1'):
+    """(encoding, bom_length) guessed from the first bytes of a file
+    
+    A BOM wins; otherwise utf-8 if the prefix decodes as utf-8 (a
+    character cut off at the end is fine), else fallback.
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8', 0
+    except UnicodeDecodeError:
+        return fallback, 0
+
 class FileReader:
-    """Context manager for file reading"""
-    def __init__(self, filename):
+    """Context manager for file reading
+    
+    mode="buffered" reads through a large buffer, mode="mmap" maps the
+    file and serves chunks as memoryview slices of the mapping. Without
+    an explicit encoding it is sniffed from the first sniff_size bytes,
+    so the file is decoded once. read() still falls back to latin-1 if a
+    bad utf-8 byte turns up after the sniffed prefix.
+    
+    Like open(..., 'r'), read(), readline(), readlines() and iteration
+    translate \r\n and \r to \n; pass newline="" to keep line endings.
+    iter_chunks() and iter_text() return the data untranslated.
+    """
+    def __init__(self, filename, mode="buffered", encoding=None, errors='strict',
+                 newline=None, buffer_size=1 << 20, sniff_size=1 << 16):
+        if mode not in ("buffered", "mmap"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if newline not in (None, ""):
+            raise ValueError("newline must be None or ''")
         self.filename = filename
+        self.mode = mode
+        self.encoding = encoding
+        self.sniffed = encoding is None
+        self.errors = errors
+        self.newline = newline
+        self.lines = None  # shared line iterator for readline() and iteration
+        self.buffer_size = buffer_size
+        self.sniff_size = sniff_size
         self.file = None
+        self.mm = None
+        self.size = 0
+        self.data_start = 0  # first byte after a BOM
     
     def __enter__(self):
-        self.file = open(self.filename, 'r')
-        return self.file
+        self.file = open(self.filename, 'rb', buffering=self.buffer_size)
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.mode == "mmap" and self.size:  # empty files can't be mapped
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        prefix = self._read_at(0, self.sniff_size)
+        sniffed, self.data_start = sniff_encoding(prefix)
+        if self.sniffed:
+            self.encoding = sniffed
+        elif codecs.lookup(self.encoding).name != codecs.lookup(sniffed).name:
+            self.data_start = 0  # e.g. 'utf-16' or 'utf-8-sig' handle the BOM themselves
+        return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                pass  # a chunk view is still alive; closed when it is collected
+            self.mm = None
         if self.file:
             self.file.close()
+    
+    def _read_at(self, start, n):
+        if self.mm is not None:
+            return self.mm[start:start + n]
+        self.file.seek(start)
+        return self.file.read(n)
+    
+    def _translate(self, text):
+        if self.newline is None and "\r" in text:
+            return text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+    
+    def read(self):
+        """Whole file as str"""
+        data = self._read_at(self.data_start, self.size)
+        try:
+            text = data.decode(self.encoding, self.errors)
+        except UnicodeDecodeError:
+            if not (self.sniffed and self.encoding == 'utf-8'):
+                raise
+            self.encoding = 'latin-1'
+            text = data.decode('latin-1')
+        return self._translate(text)
+    
+    def iter_chunks(self, start=None, end=None, size=None):
+        """Raw bytes of [start, end) as memoryviews of at most size bytes
+        
+        mmap mode: zero-copy slices of the mapping. Buffered mode: the
+        same bytearray is refilled with readinto, so each view is only
+        valid until the next one is produced.
+        """
+        start = self.data_start if start is None else start
+        end = self.size if end is None else min(end, self.size)
+        size = size or self.buffer_size
+        if self.mm is not None:
+            view = memoryview(self.mm)
+            for pos in range(start, end, size):
+                yield view[pos:min(pos + size, end)]
+            return
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        self.file.seek(start)
+        pos = start
+        while pos < end:
+            n = self.file.readinto(view[:min(size, end - pos)])
+            if not n:
+                break
+            pos += n
+            yield view[:n]
+    
+    def iter_text(self, start=None, end=None, size=None):
+        """Decoded chunks of text; multi-byte characters split between
+        chunks are carried over"""
+        decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+        for chunk in self.iter_chunks(start, end, size):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+    
+    def iter_line_blocks(self, start=None, end=None):
+        """Lists of complete lines, one list per buffer-sized block
+        
+        Each block is decoded once and cut after its last line ending;
+        the remainder is carried into the next block. A trailing \r is
+        carried too, in case the next block starts with \n.
+        """
+        carry = ""
+        for text in self.iter_text(start, end):
+            text = carry + text
+            cut = max(text.rfind("\n"), text.rfind("\r", 0, len(text) - 1)) + 1
+            carry = text[cut:]
+            if cut:
+                yield self._split_lines(text[:cut])
+        if carry:
+            yield self._split_lines(carry)
+    
+    def _split_lines(self, text):
+        # StringIO splits only at \n, \r\n and \r (and translates them
+        # when newline is None), unlike str.splitlines
+        return io.StringIO(text, newline=self.newline).readlines()
+    
+    def iter_lines(self, start=None, end=None):
+        return itertools.chain.from_iterable(self.iter_line_blocks(start, end))
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        if self.lines is None:
+            self.lines = self.iter_lines()
+        return next(self.lines)
+    
+    def readline(self):
+        """Next line, or "" at the end of the file"""
+        return next(self, "")
+    
+    def readlines(self):
+        return list(self)
+    
+    def line_ranges(self, n_parts):
+        """Split the file into about n_parts byte ranges that start and end
+        on line boundaries, for processing in parallel"""
+        if "\n".encode(self.encoding) != b"\n":
+            raise ValueError(f"Byte ranges need an ASCII-compatible encoding, not {self.encoding}")
+        step = max((self.size - self.data_start) // max(n_parts, 1), 1)
+        bounds = [self.data_start]
+        while bounds[-1] + step < self.size:
+            pos = self._find_newline(bounds[-1] + step)
+            if pos >= self.size:
+                break
+            bounds.append(pos)
+        bounds.append(self.size)
+        return list(zip(bounds, bounds[1:]))
+    
+    def _find_newline(self, pos):
+        """Offset just past the first newline at or after pos"""
+        if self.mm is not None:
+            found = self.mm.find(b"\n", pos)
+            return self.size if found < 0 else found + 1
+        self.file.seek(pos)
+        line = self.file.readline()
+        return pos + len(line)
+
+def _lines_in_range(task):
+    filename, encoding, errors, start, end, func = task
+    with FileReader(filename, mode="mmap", encoding=encoding, errors=errors) as reader:
+        return func(reader.iter_lines(start, end))
+
+def map_line_ranges(filename, func, workers=None, encoding=None, errors='strict'):
+    """Run func(lines) over line-aligned ranges of one big file in worker
+    processes; returns the results in file order. func must be picklable
+    (a module-level function)."""
+    workers = workers or os.cpu_count() or 1
+    with FileReader(filename, encoding=encoding, errors=errors) as reader:
+        ranges = reader.line_ranges(workers)
+        encoding = reader.encoding
+    tasks = [(filename, encoding, errors, start, end, func) for start, end in ranges]
+    if workers == 1 or len(tasks) == 1:
+        return [_lines_in_range(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_lines_in_range, tasks))
+
+def _count_lines_and_chars(lines):
+    n_lines = n_chars = 0
+    for line in lines:
+        n_lines += 1
+        n_chars += len(line)
+    return n_lines, n_chars
+
+def benchmark_file_reader(size_mb=32, workers=2, repeat=3):
+    """Old open().read() with an encoding retry loop vs FileReader
+    
+    The file is utf-8 text with one latin-1 byte near the end: the
+    retry loop decodes almost all of it as utf-8, fails, then re-opens
+    and re-reads it as latin-1. Best of repeat runs.
+    """
+    line = "café naïve résumé, the quick brown fox jumps over the lazy dog\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.txt")
+        with open(path, 'wb') as f:
+            f.write(line.encode('utf-8') * (size_mb * (1 << 20) // len(line)))
+            f.write("déjà vu\n".encode('latin-1'))
+        
+        def read_with_retries():
+            # read_text_safe before: re-open and re-read for each encoding
+            for enc in ['utf-8', 'latin-1', 'cp1252']:
+                try:
+                    with open(path, 'r', encoding=enc) as f:
+                        return f.read()
+                except UnicodeDecodeError:
+                    continue
+        
+        def old_lines():
+            with open(path, 'r', encoding='latin-1') as f:
+                return _count_lines_and_chars(f)
+        
+        def reader(mode, method, encoding=None):
+            def run():
+                with FileReader(path, mode=mode, encoding=encoding) as r:
+                    if method == "read":
+                        return r.read()
+                    if method == "lines":
+                        return _count_lines_and_chars(r.iter_lines())
+                    return sum(chunk.nbytes for chunk in r.iter_chunks())
+            return run
+        
+        cases = [
+            ("read(), encoding retries", read_with_retries),
+            ("FileReader buffered read()", reader("buffered", "read")),
+            ("FileReader mmap read()", reader("mmap", "read")),
+            ("text-mode line loop", old_lines),
+            # streaming can't go back and re-decode, so give the encoding
+            ("FileReader iter_lines", reader("buffered", "lines", 'latin-1')),
+            ("FileReader mmap iter_lines", reader("mmap", "lines", 'latin-1')),
+            ("FileReader mmap iter_chunks", reader("mmap", "chunks")),
+            (f"map_line_ranges x{workers}",
+             lambda: map_line_ranges(path, _count_lines_and_chars, workers, encoding='latin-1')),
+        ]
+        print(f"{size_mb} MB file:")
+        for label, func in cases:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - start)
+            print(f"  {label:>28}: {best:.3f}s")
 
 # ===== ADVANCED SOLUTIONS =====
 
-def retry(max_attempts=3):
-    """Decorator for retrying failed functions"""
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when an async call is cancelled because the retry deadline ran out"""
+
+class CircuitBreaker:
+    """Fails fast once the recent error rate crosses a threshold
+    
+    closed    - calls go through; the last `window` outcomes are kept
+    open      - calls raise CircuitOpenError for reset_timeout seconds
+    half_open - one trial call; success closes, failure re-opens
+    
+    Share one breaker between every caller of the same dependency.
+    """
+    def __init__(self, failure_threshold=0.5, window=20, min_calls=10,
+                 reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)  # True = failure
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+    
+    @property
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+    
+    def allow(self):
+        with self.lock:
+            if self.state == "open":
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+                self.trial_running = False
+            if self.state == "half_open":
+                if self.trial_running:
+                    return False
+                self.trial_running = True
+            return True
+    
+    def release_trial(self):
+        """End a half-open trial without an outcome (e.g. it was cancelled)"""
+        with self.lock:
+            self.trial_running = False
+    
+    def record_success(self):
+        with self.lock:
+            self.trial_running = False
+            if self.state == "half_open":
+                self.state = "closed"
+                self.outcomes.clear()
+            self.outcomes.append(False)
+    
+    def record_failure(self):
+        with self.lock:
+            self.trial_running = False
+            self.outcomes.append(True)
+            if self.state == "half_open" or (
+                    len(self.outcomes) >= self.min_calls
+                    and self.error_rate >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = self.clock()
+
+class RetryPolicy:
+    """Which errors to retry, how long to wait, and when to give up
+    
+    Delays grow as base_delay * multiplier**attempt up to max_delay;
+    with jitter each delay is drawn uniformly from [0, that value]
+    ("full jitter") so many clients don't retry in lockstep. deadline
+    is a total time budget in seconds across all attempts; async
+    attempts are cancelled when it runs out, sync ones are not.
+    """
+    def __init__(self, max_attempts=3, exceptions=(Exception,), base_delay=0.1,
+                 max_delay=10.0, multiplier=2.0, jitter=True, deadline=None,
+                 breaker=None, clock=time.monotonic, rng=None):
+        self.max_attempts = max_attempts
+        self.exceptions = exceptions
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.breaker = breaker
+        self.clock = clock
+        self.rng = rng or random.Random()
+    
+    def before_call(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("circuit open, not calling dependency")
+    
+    def on_success(self):
+        if self.breaker is not None:
+            self.breaker.record_success()
+    
+    def on_abort(self):
+        """An exception that isn't retried: free a half-open trial slot"""
+        if self.breaker is not None:
+            self.breaker.release_trial()
+    
+    def on_timeout(self):
+        """The deadline ran out mid-call: a failure, and the last attempt"""
+        if self.breaker is not None:
+            self.breaker.record_failure()
+    
+    def remaining(self, started):
+        """Seconds left before the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return self.deadline - (self.clock() - started)
+    
+    def on_failure(self, attempt, started):
+        """Delay before the next attempt, or None to re-raise"""
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        if self.jitter:
+            delay = self.rng.uniform(0, delay)
+        if self.deadline is not None and self.clock() - started + delay > self.deadline:
+            return None
+        return delay
+
+def retry(max_attempts=3, exceptions=(Exception,), base_delay=0.1, max_delay=10.0,
+          multiplier=2.0, jitter=True, deadline=None, breaker=None,
+          sleep=time.sleep, async_sleep=asyncio.sleep, clock=time.monotonic, rng=None):
+    """Decorator for retrying failed functions
+    
+    Works on plain functions and on async def coroutines (which await
+    async_sleep between attempts instead of blocking the event loop).
+    Only exceptions matching `exceptions` are retried; anything else is
+    raised at once. See RetryPolicy and CircuitBreaker for the rest.
+    
+    With a deadline, each async attempt runs under asyncio.wait_for with
+    the remaining budget and raises DeadlineExceeded when it runs out.
+    A sync call in flight can't be interrupted, so there the deadline
+    only stops further retries and a slow call can overrun it.
+    """
+    policy = RetryPolicy(max_attempts, exceptions, base_delay, max_delay, multiplier,
+                         jitter, deadline, breaker, clock, rng)
+    
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            async def attempt_call(started, args, kwargs):
+                budget = policy.remaining(started)
+                if budget is None:
+                    return await func(*args, **kwargs)
+                try:
+                    return await asyncio.wait_for(func(*args, **kwargs), budget)
+                except asyncio.TimeoutError:
+                    if policy.remaining(started) > 0:
+                        raise  # func's own TimeoutError, not the deadline
+                    raise DeadlineExceeded(
+                        f"{func.__name__} exceeded its {policy.deadline}s deadline") from None
+            
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = clock()
+                for attempt in itertools.count():
+                    policy.before_call()
+                    try:
+                        result = await attempt_call(started, args, kwargs)
+                    except DeadlineExceeded:
+                        policy.on_timeout()
+                        raise
+                    except policy.exceptions:
+                        delay = policy.on_failure(attempt, started)
+                        if delay is None:
+                            raise
+                        await async_sleep(delay)
+                    except BaseException:
+                        policy.on_abort()  # other errors and cancellation
+                        raise
+                    else:
+                        policy.on_success()
+                        return result
+            async_wrapper.policy = policy
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            for attempt in range(max_attempts):
+            started = clock()
+            for attempt in itertools.count():
+                policy.before_call()
                 try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt == max_attempts - 1:
+                    result = func(*args, **kwargs)
+                except policy.exceptions:
+                    delay = policy.on_failure(attempt, started)
+                    if delay is None:
                         raise
-                    print(f"Attempt {attempt + 1} failed, retrying...")
+                    sleep(delay)
+                except BaseException:
+                    policy.on_abort()  # other errors and cancellation
+                    raise
+                else:
+                    policy.on_success()
+                    return result
+        wrapper.policy = policy
         return wrapper
     return decorator
 
-def pipeline_generator(batches):
-    """Generator for processing ML pipeline steps"""
+class FlakyService:
+    """Local stand-in for an unreliable dependency
+    
+    Fails with ConnectionError at failure_rate, or always while down
+    is True; call() is sync and acall() is the async version.
+    """
+    def __init__(self, failure_rate=0.3, latency=0.0, seed=0):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.down = False
+        self.calls = 0
+        self.rng = random.Random(seed)
+    
+    def _outcome(self, x):
+        self.calls += 1
+        if self.down or self.rng.random() < self.failure_rate:
+            raise ConnectionError(f"call {self.calls} failed")
+        return x * 2
+    
+    def call(self, x):
+        time.sleep(self.latency)
+        return self._outcome(x)
+    
+    async def acall(self, x):
+        await asyncio.sleep(self.latency)
+        return self._outcome(x)
+
+def demo_resilience():
+    """Retries against FlakyService, then the breaker during an outage"""
+    service = FlakyService(failure_rate=0.3)
+    breaker = CircuitBreaker(failure_threshold=0.6, window=20, min_calls=10, reset_timeout=0.05)
+    
+    @retry(max_attempts=4, exceptions=(ConnectionError,), base_delay=0.001,
+           deadline=1.0, breaker=breaker)
+    def fetch(x):
+        return service.call(x)
+    
+    @retry(max_attempts=4, exceptions=(ConnectionError,), base_delay=0.001, breaker=breaker)
+    async def afetch(x):
+        return await service.acall(x)
+    
+    async def fetch_all(items):
+        return await asyncio.gather(*(afetch(i) for i in items))
+    
+    results = [fetch(i) for i in range(20)]
+    results += asyncio.run(fetch_all(range(20)))
+    print(f"40 requests ok after {service.calls} calls (30% failing), breaker {breaker.state}")
+    
+    service.down = True
+    calls_before = service.calls
+    outcomes = Counter()
+    for i in range(50):
+        try:
+            fetch(i)
+        except (ConnectionError, CircuitOpenError) as e:
+            outcomes[type(e).__name__] += 1
+    print(f"Outage: {dict(outcomes)}, {service.calls - calls_before} calls "
+          f"reached the service, breaker {breaker.state}")
+    
+    service.down = False
+    time.sleep(breaker.reset_timeout)
+    print(f"Recovered: fetch(21) = {fetch(21)}, breaker {breaker.state}")
+
+def rebatch(batches, batch_size):
+    """Re-chunk a stream of batches into batches of exactly batch_size
+    (the last one may be smaller)"""
+    buffer = []
+    for batch in batches:
+        buffer.extend(batch)
+        while len(buffer) >= batch_size:
+            yield buffer[:batch_size]
+            del buffer[:batch_size]
+    if buffer:
+        yield buffer
+
+_END = object()
+
+def prefetch(iterable, buffer_size=2):
+    """Produce items on a background thread, at most buffer_size ahead
+    
+    The bounded queue makes a fast producer wait for the consumer.
+    Producer errors are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+    
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put((_END, e))
+            return
+        put((_END, None))
+    
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if type(item) is tuple and len(item) == 2 and item[0] is _END:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        stop.set()  # consumer stopped early or finished: release producer
+        thread.join()
+
+def vectorized(func):
+    """Let a batch transform work on a whole numpy array
+    
+    Opt-in: numpy coerces the batch to one dtype ([1, 2.5] -> floats)
+    and rejects non-numeric data, so use it only for numeric batches.
+    """
+    @wraps(func)
+    def wrapper(batch):
+        return func(np.asarray(batch))
+    return wrapper
+
+def double_batch(batch):
+    """Default transform; works for any items that support * 2"""
+    return [x * 2 for x in batch]
+
+@vectorized
+def double_array(batch):
+    """Numeric-only double_batch that runs in one numpy operation"""
+    return (batch * 2).tolist()
+
+def write_batches(batches, filepath):
+    """Sink: append each batch to a text file as it arrives, one value
+    per line. Returns the number of values written."""
+    count = 0
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for batch in batches:
+            f.writelines(f"{x}\n" for x in batch)
+            f.flush()
+            count += len(batch)
+    return count
+
+def pipeline_generator(batches, transform=double_batch, batch_size=None, prefetch_size=0):
+    """Generator for processing ML pipeline steps
+    
+    Optionally re-chunks the input to batch_size and loads the next
+    prefetch_size batches on a background thread while the current
+    one is being transformed.
+    """
+    if batch_size:
+        batches = rebatch(batches, batch_size)
+    if prefetch_size:
+        batches = prefetch(batches, prefetch_size)
     for batch in batches:
-        processed = [x * 2 for x in batch]
-        yield processed
+        yield transform(batch)
 
 if __name__ == "__main__":
     @timer
@@ -84,6 +982,11 @@ if __name__ == "__main__":
         time.sleep(0.1)
     
     slow_function()
+    print(REGISTRY.snapshot()["slow_function"])
+    benchmark_timed_overhead()
+    demo_resilience()
+    benchmark_validate_input()
+    benchmark_file_reader()
     
     for fib in fibonacci_gen(5):
         print(fib)
@@ -2,9 +2,22 @@
 Solutions for Exercise Set 4: Performance Optimization & ML Pipelines
 """
 
+import hashlib
 import logging
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
 import time
-from functools import lru_cache
+import types
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+
+import numpy as np
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -46,40 +59,743 @@ def process_large_dataset(max_size=1000000):
 
 # ===== ADVANCED SOLUTIONS =====
 
+def iter_batches(data, batch_size):
+    """Yield batches of up to batch_size items from any iterable
+    
+    Columnar sources (anything with iter_batches, like ColumnarDataset)
+    and numpy arrays are sliced without copying; everything else is
+    batched into lists.
+    """
+    if hasattr(data, "iter_batches"):
+        yield from data.iter_batches(batch_size)
+        return
+    if isinstance(data, np.ndarray):
+        for start in range(0, len(data), batch_size):
+            yield data[start:start + batch_size]
+        return
+    it = iter(data)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def batch_values(batch):
+    """The values of a batch; a dataset slice must have exactly one column"""
+    columns = getattr(batch, "columns", None)
+    if columns is None:
+        return batch
+    if len(columns) != 1:
+        raise ValueError(f"Batch has columns {list(columns)}; pass column= to "
+                         "load_data or reduce the batch to one column in a stage")
+    return next(iter(columns.values()))
+
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+Stage = namedtuple("Stage", "name func stream executor workers")
+
+def code_fingerprint(func, _seen=None):
+    """Bytes that change when a function's code or the values it uses change
+    
+    Covers the bytecode, default arguments, closure cells and the
+    globals it names (functions recursively). Returns None if one of
+    those values can't be pickled: such a stage is never checkpointed.
+    Sets and dicts are hashed in sorted order, so the result doesn't
+    depend on PYTHONHASHSEED and a restarted process can resume.
+    """
+    seen = set() if _seen is None else _seen
+    
+    def value_bytes(value):
+        if isinstance(value, types.FunctionType):
+            if id(value) in seen:
+                return value.__qualname__.encode()
+            return code_fingerprint(value, seen)
+        if isinstance(value, (types.ModuleType, type, types.BuiltinFunctionType)):
+            return repr(value).encode()
+        if isinstance(value, (set, frozenset, dict)) or (
+                isinstance(value, (list, tuple))
+                and not all(isinstance(v, ATOMIC_TYPES) for v in value)):
+            return container_bytes(value)
+        try:
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+    
+    def container_bytes(value):
+        """Hash each element; sort them for sets and dicts"""
+        items = value.items() if isinstance(value, dict) else value
+        digests = []
+        for item in items:
+            data = value_bytes(item)
+            if data is None:
+                return None
+            digests.append(hashlib.sha256(data).digest())
+        if isinstance(value, (set, frozenset, dict)):
+            digests.sort()
+        return type(value).__name__.encode() + b"".join(digests)
+    
+    def code_bytes(code, names):
+        parts = [code.co_code, repr(code.co_names).encode()]
+        names.update(code.co_names)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                parts.append(code_bytes(const, names))
+            else:  # e.g. frozenset({"a", "b"}) from `x in {"a", "b"}`
+                parts.append(value_bytes(const) or repr(const).encode())
+        return b"".join(parts)
+    
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return repr(func).encode()  # no stable identity, never reused
+    seen.add(id(func))
+    names = set()
+    parts = [code_bytes(code, names)]
+    values = [func.__defaults__, func.__kwdefaults__]
+    values += [cell.cell_contents for cell in func.__closure__ or ()]
+    func_globals = getattr(func, "__globals__", {})
+    values += [func_globals[name] for name in sorted(names) if name in func_globals]
+    for value in values:
+        data = value_bytes(value)
+        if data is None:
+            return None
+        parts.append(hashlib.sha256(data).digest())
+    return b"".join(parts)
+
+ATOMIC_TYPES = (int, float, complex, str, bytes, bool, type(None))
+
+# A stage that uses a set constant and a global set, whose iteration
+# order changes with the hash seed
+_PROBE_LABELS = {"spam", "ham", "eggs", "toast", "beans"}
+
+def _fingerprint_probe(batch):
+    return [x for x in batch if x not in {"a", "b", "c", "d"} and x not in _PROBE_LABELS]
+
+def check_fingerprint_stable(func_name="_fingerprint_probe", seeds=("1", "2", "3")):
+    """True if code_fingerprint of a module-level function is identical in
+    fresh interpreters started with different PYTHONHASHSEED values"""
+    script = ("import runpy, sys; m = runpy.run_path(sys.argv[1]); "
+              "print(m['code_fingerprint'](m[sys.argv[2]]).hex())")
+    fingerprints = set()
+    for seed in seeds:
+        result = subprocess.run([sys.executable, "-c", script, os.path.abspath(__file__), func_name],
+                                env=dict(os.environ, PYTHONHASHSEED=seed),
+                                capture_output=True, text=True, check=True)
+        fingerprints.add(result.stdout.split()[-1])
+    return len(fingerprints) == 1
+
+class CheckpointStore:
+    """One stage's output batches on disk, one pickle file per chunk"""
+    DONE = "_DONE"
+    
+    def __init__(self, root, key):
+        self.path = os.path.join(root, key)
+        os.makedirs(self.path, exist_ok=True)
+    
+    def _chunk(self, index):
+        return os.path.join(self.path, f"{index:08d}.pkl")
+    
+    def __contains__(self, index):
+        return os.path.exists(self._chunk(index))
+    
+    def load(self, index):
+        with open(self._chunk(index), "rb") as f:
+            return pickle.load(f)
+    
+    def save(self, index, batch):
+        tmp = self._chunk(index) + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._chunk(index))  # a crash never leaves half a chunk
+    
+    @property
+    def complete(self):
+        return os.path.exists(os.path.join(self.path, self.DONE))
+    
+    def mark_complete(self):
+        open(os.path.join(self.path, self.DONE), "w").close()
+    
+    def clear(self):
+        for filename in os.listdir(self.path):
+            os.remove(os.path.join(self.path, filename))
+    
+    def __iter__(self):
+        index = 0
+        while index in self:
+            yield self.load(index)
+            index += 1
+
+def map_batches(func, batches, pool=None, max_pending=1, store=None):
+    """Ordered map over batches, optionally on a pool and checkpointed
+    
+    At most max_pending batches are in flight. Chunks already in the
+    store are loaded instead of recomputed.
+    """
+    pending = deque()  # (index, result or Future, needs saving)
+    
+    def finish(index, result, needs_save):
+        if isinstance(result, Future):
+            result = result.result()
+        if needs_save:
+            store.save(index, result)
+        return result
+    
+    for index, batch in enumerate(batches):
+        if len(pending) >= max_pending:
+            yield finish(*pending.popleft())
+        if store is not None and index in store:
+            pending.append((index, store.load(index), False))
+        elif pool is None:
+            pending.append((index, func(batch), store is not None))
+        else:
+            pending.append((index, pool.submit(func, batch), store is not None))
+    while pending:
+        yield finish(*pending.popleft())
+    if store is not None:
+        store.mark_complete()
+
+def checkpoint_stream(batches, store):
+    """Save every batch of a stream stage; it can only resume once complete"""
+    store.clear()
+    for index, batch in enumerate(batches):
+        store.save(index, batch)
+        yield batch
+    store.mark_complete()
+
 class Pipeline:
-    """Full ML pipeline with error handling and logging"""
-    def __init__(self, name):
+    """Full ML pipeline with error handling and logging
+    
+    Stages are registered callables. A batch stage maps one batch (list)
+    to a new batch; a stream stage takes the iterator of batches and
+    yields batches. Nothing runs until evaluate() pulls data through,
+    so only batch_size items per stage are alive at a time.
+    
+    Batch stages can run inline or on a "thread" or "process" pool.
+    Pooled stages keep at most 2 * workers batches in flight and yield
+    results in input order. Process stages need a picklable
+    (module-level) function.
+    
+    With checkpoint_dir set, every stage's output is saved chunk by chunk
+    under a key hashed from the data key, the upstream stages and the
+    stage's code. A rerun starts after the last completed stage and
+    reloads finished chunks of a batch stage instead of recomputing them.
+    """
+    def __init__(self, name, batch_size=10000, checkpoint_dir=None):
         self.name = name
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
         self.data = None
+        self.data_key = None
+        self.stages = []   # Stage tuples, in order
+        self.timings = {}  # stage name -> seconds spent in that stage
     
-    def load_data(self, data):
+    def load_data(self, data, key=None, column=None):
+        """Set the source; key identifies it for checkpoints
+        
+        A columnar source (like ColumnarDataset) reaches stages as
+        dataset slices; batch["name"] is a column's array. Pass column
+        to stream just that column as numpy array views instead.
+        """
         logger.info(f"Loading data for {self.name}")
-        if not data:
+        if column is not None:
+            data = data[column]
+        if data is None or (hasattr(data, "__len__") and len(data) == 0):
             raise ValueError("Data cannot be empty")
         self.data = data
-        logger.info(f"Loaded {len(data)} samples")
+        self.data_key = key
+        if hasattr(data, "__len__"):
+            logger.info(f"Loaded {len(data)} samples")
+        return self
+    
+    def add_stage(self, name, func, stream=False, executor="inline", workers=None):
+        if executor != "inline" and executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor}")
+        if stream and executor != "inline":
+            raise ValueError("Stream stages must run inline")
+        workers = workers or os.cpu_count() or 1
+        self.stages.append(Stage(name, func, stream, executor, workers))
+        return self
     
     def preprocess(self):
         logger.info("Preprocessing data")
-        self.data = [x * 2 for x in self.data]
+        return self.add_stage("preprocess", lambda batch: [x * 2 for x in batch_values(batch)])
+    
+    def _timed(self, batches, clock):
+        """Record the cumulative time spent producing each batch"""
+        it = iter(batches)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(it)
+            except StopIteration:
+                return
+            finally:
+                clock[0] += time.perf_counter() - start
+            yield batch
+    
+    def _checkpoint_stores(self):
+        """One CheckpointStore per stage, or Nones if checkpointing is off"""
+        if self.checkpoint_dir is None:
+            return [None] * len(self.stages)
+        key = self.data_key or self._hash_data()
+        if key is None:
+            logger.warning("No data key given, checkpointing disabled")
+            return [None] * len(self.stages)
+        stores = []
+        for stage in self.stages:
+            fingerprint = code_fingerprint(stage.func) if key else None
+            if fingerprint is None:
+                if key:
+                    logger.warning(f"Stage {stage.name} uses unpicklable values, "
+                                   "not checkpointing it or later stages")
+                key = None
+                stores.append(None)
+                continue
+            digest = hashlib.sha256(key.encode())
+            digest.update(f"{stage.name}|{stage.stream}|{self.batch_size}".encode())
+            digest.update(fingerprint)
+            key = digest.hexdigest()
+            stores.append(CheckpointStore(self.checkpoint_dir, key[:16]))
+        return stores
+    
+    def _hash_data(self):
+        """Key for in-memory sources; only computed when checkpointing"""
+        if isinstance(self.data, np.ndarray):
+            digest = hashlib.sha256(repr((self.data.dtype, self.data.shape)).encode())
+            hash_batch = lambda batch: np.ascontiguousarray(batch)
+        elif isinstance(self.data, (list, tuple, range)):
+            digest = hashlib.sha256(type(self.data).__name__.encode())
+            hash_batch = pickle.dumps
+        else:
+            return None
+        # Batch by batch, so hashing never copies the whole source
+        for batch in iter_batches(self.data, self.batch_size):
+            digest.update(hash_batch(batch))
+        return digest.hexdigest()
+    
+    def run(self):
+        """Lazily yield the output batches of the last stage"""
+        if self.data is None:
+            raise ValueError("No data loaded")
+        stores = self._checkpoint_stores()
+        
+        # Skip everything up to the last stage that already finished
+        first = 0
+        source = iter_batches(self.data, self.batch_size)
+        for i in range(len(stores) - 1, -1, -1):
+            if stores[i] is not None and stores[i].complete:
+                logger.info(f"Resuming after checkpointed stage {self.stages[i].name}")
+                source = iter(stores[i])
+                first = i + 1
+                break
+        for stage in self.stages[:first]:
+            self.timings[stage.name] = 0.0
+        
+        names = ["load"] + [stage.name for stage in self.stages[first:]]
+        clocks = [[0.0] for _ in names]
+        pools = []
+        
+        batches = self._timed(source, clocks[0])
+        for stage, store, clock in zip(self.stages[first:], stores[first:], clocks[1:]):
+            if stage.stream:
+                batches = stage.func(batches)
+                if store is not None:
+                    batches = checkpoint_stream(batches, store)
+            elif stage.executor == "inline":
+                batches = map_batches(stage.func, batches, store=store)
+            else:
+                pool = EXECUTORS[stage.executor](max_workers=stage.workers)
+                pools.append(pool)
+                batches = map_batches(stage.func, batches, pool,
+                                      2 * stage.workers, store)
+            batches = self._timed(batches, clock)
+        try:
+            yield from batches
+        finally:
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+            # Each clock includes upstream time; subtract it per stage
+            upstream = 0.0
+            for name, (total,) in zip(names, clocks):
+                self.timings[name] = total - upstream
+                upstream = total
     
     def evaluate(self):
         logger.info("Evaluating pipeline")
-        return sum(self.data) / len(self.data)
+        count, mean = 0, 0.0
+        for batch in self.run():
+            batch = batch_values(batch)
+            count += len(batch)
+            mean += (sum(batch) - len(batch) * mean) / count
+        if count == 0:
+            raise ValueError("Data cannot be empty")
+        for name, seconds in self.timings.items():
+            logger.info(f"Stage {name}: {seconds:.4f}s")
+        return mean
+
+class FeatureCache:
+    """Base class for bounded feature caches with hit/miss/eviction counters"""
+    def __init__(self, capacity=10000):
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self)}
+
+class LRUFeatureCache(FeatureCache):
+    """Evicts the least recently used entry"""
+    def __init__(self, capacity=10000):
+        super().__init__(capacity)
+        self.data = OrderedDict()
+    
+    def _get(self, key):
+        if key not in self.data:
+            return None
+        self.data.move_to_end(key)
+        return self.data[key]
+    
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.capacity:
+            self.data.popitem(last=False)
+            self.evictions += 1
+    
+    def __len__(self):
+        return len(self.data)
+
+class LFUFeatureCache(FeatureCache):
+    """Evicts the least frequently used entry (oldest first on ties)"""
+    def __init__(self, capacity=10000):
+        super().__init__(capacity)
+        self.data = {}                           # key -> (value, freq)
+        self.by_freq = defaultdict(OrderedDict)  # freq -> keys
+        self.min_freq = 0
+    
+    def _touch(self, key, value, freq):
+        del self.by_freq[freq][key]
+        if not self.by_freq[freq]:
+            del self.by_freq[freq]
+            if self.min_freq == freq:
+                self.min_freq = freq + 1
+        self.data[key] = (value, freq + 1)
+        self.by_freq[freq + 1][key] = None
+    
+    def _get(self, key):
+        if key not in self.data:
+            return None
+        value, freq = self.data[key]
+        self._touch(key, value, freq)
+        return value
+    
+    def put(self, key, value):
+        if key in self.data:
+            self._touch(key, value, self.data[key][1])
+            return
+        if len(self.data) >= self.capacity:
+            evicted, _ = self.by_freq[self.min_freq].popitem(last=False)
+            if not self.by_freq[self.min_freq]:
+                del self.by_freq[self.min_freq]
+            del self.data[evicted]
+            self.evictions += 1
+        self.data[key] = (value, 1)
+        self.by_freq[1][key] = None
+        self.min_freq = 1
+    
+    def __len__(self):
+        return len(self.data)
+
+class TTLFeatureCache(FeatureCache):
+    """Entries expire ttl seconds after being stored"""
+    def __init__(self, capacity=10000, ttl=60.0):
+        super().__init__(capacity)
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (value, expires_at), oldest first
+    
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.data[key]
+            self.evictions += 1
+            return None
+        return entry[0]
+    
+    def put(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = (value, time.monotonic() + self.ttl)
+        if len(self.data) > self.capacity:
+            self.data.popitem(last=False)
+            self.evictions += 1
+    
+    def __len__(self):
+        return len(self.data)
+
+class SharedFeatureCache(FeatureCache):
+    """Direct-mapped cache of integer features in shared memory
+    
+    One process creates it; workers attach with the same name and reuse
+    each other's entries. Keys are 8-byte blake2b digests of the text,
+    a colliding insert overwrites the slot. Counters are per process.
+    
+    Each slot is (tag, value, check) with check = _check(tag, value).
+    Writers don't lock each other out, so two colliding puts can
+    interleave and leave one key's tag next to the other's value; the
+    check word then doesn't match and the slot reads as a miss until
+    the next put repairs it.
+    """
+    SLOT_SIZE = 24  # int64 key digest + int64 value + int64 check
+    
+    def __init__(self, capacity=100000, name=None, create=True):
+        super().__init__(capacity)
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=create, size=capacity * self.SLOT_SIZE)
+        self.slots = self.shm.buf.cast('q')
+        self.name = self.shm.name
+    
+    def _slot(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        tag = int.from_bytes(digest, "little", signed=True) or 1
+        return tag, 3 * (tag % self.capacity)
+    
+    @staticmethod
+    def _check(tag, value):
+        """64-bit mix of tag and value, as a signed int64"""
+        mixed = ((tag ^ (value * 0x9E3779B97F4A7C15)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        mixed ^= mixed >> 31
+        return mixed - (1 << 64) if mixed >= 1 << 63 else mixed
+    
+    def _get(self, key):
+        tag, slot = self._slot(key)
+        slots = self.slots
+        if slots[slot] != tag:
+            return None
+        value = slots[slot + 1]
+        check = slots[slot + 2]
+        # Seqlock-style re-check against a concurrent writer, plus the
+        # check word against two writers that interleaved
+        if slots[slot] != tag or check != self._check(tag, value):
+            return None
+        return value
+    
+    def put(self, key, value):
+        tag, slot = self._slot(key)
+        if self.slots[slot] not in (0, tag):
+            self.evictions += 1
+        self.slots[slot] = 0          # invalidate while the value changes
+        self.slots[slot + 1] = value
+        self.slots[slot + 2] = self._check(tag, value)
+        self.slots[slot] = tag
+    
+    def __len__(self):
+        return sum(1 for i in range(0, len(self.slots), 3) if self.slots[i])
+    
+    def close(self, unlink=False):
+        self.slots.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+def make_feature_cache(policy="lru", capacity=10000, ttl=60.0):
+    """Build a feature cache by policy name: lru, lfu or ttl"""
+    if policy == "lru":
+        return LRUFeatureCache(capacity)
+    if policy == "lfu":
+        return LFUFeatureCache(capacity)
+    if policy == "ttl":
+        return TTLFeatureCache(capacity, ttl)
+    raise ValueError(f"Unknown cache policy: {policy}")
+
+def cpu_heavy_preprocess(batch):
+    """CPU-bound stand-in for feature engineering"""
+    out = []
+    for x in batch:
+        acc = x
+        for _ in range(200):
+            acc = (acc * 31 + 7) % 1000003
+        out.append(acc)
+    return out
+
+def benchmark_parallel_pipeline(n=100000, batch_size=2500):
+    """Time a CPU-bound stage inline vs. on a process pool"""
+    results = {}
+    for executor in ("inline", "process"):
+        pipeline = Pipeline(f"bench-{executor}", batch_size=batch_size)
+        pipeline.load_data(range(n))
+        pipeline.add_stage("preprocess", cpu_heavy_preprocess, executor=executor)
+        start = time.perf_counter()
+        results[executor] = pipeline.evaluate()
+        elapsed = time.perf_counter() - start
+        print(f"{executor:>7}: {elapsed:.2f}s")
+        if executor == "inline":
+            baseline = elapsed
+    assert results["inline"] == results["process"]
+    print(f"Speedup with {os.cpu_count()} cores: {baseline / elapsed:.1f}x")
 
 class TextClassifier:
     """Optimized text classifier with caching"""
-    def __init__(self):
-        self.cache = {}
+    THRESHOLD = 5
+    LABELS = np.array(["negative", "positive"])
+    
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else LRUFeatureCache()
+    
+    def compute_features(self, text):
+        return len(text.split())
     
-    @lru_cache(maxsize=128)
     def extract_features(self, text):
-        features = len(text.split())
+        features = self.cache.get(text)
+        if features is None:
+            features = self.compute_features(text)
+            self.cache.put(text, features)
         return features
     
+    def extract_features_batch(self, texts):
+        """Features for a batch; each distinct text is looked up once"""
+        unique = dict.fromkeys(texts)
+        for text in unique:
+            unique[text] = self.extract_features(text)
+        return np.fromiter(map(unique.__getitem__, texts), dtype=np.int64,
+                           count=len(texts))
+    
     def predict(self, text):
         features = self.extract_features(text)
-        return "positive" if features > 5 else "negative"
+        return "positive" if features > self.THRESHOLD else "negative"
+    
+    def predict_batch(self, texts):
+        """Labels for a list of texts as a numpy string array"""
+        features = self.extract_features_batch(texts)
+        return self.LABELS[(features > self.THRESHOLD).astype(np.intp)]
+
+class MicroBatcher:
+    """Collects single predict requests into batches for predict_batch
+    
+    A batch is scored when max_batch requests are waiting or max_wait_ms
+    has passed since the first one arrived. submit() returns a Future.
+    """
+    def __init__(self, classifier, max_batch=64, max_wait_ms=2.0):
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+    
+    def submit(self, text):
+        future = Future()
+        self.requests.put((text, future))
+        return future
+    
+    def predict(self, text):
+        return self.submit(text).result()
+    
+    def _run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.requests.put(None)
+                    break
+                batch.append(item)
+            # Drop requests cancelled while queued; the rest can't be cancelled now
+            batch = [(text, future) for text, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                labels = self.classifier.predict_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    self._settle(future.set_exception, e)
+                continue
+            for (_, future), label in zip(batch, labels):
+                self._settle(future.set_result, str(label))
+    
+    @staticmethod
+    def _settle(setter, value):
+        """Set a future's outcome without letting a bad future kill the worker"""
+        try:
+            setter(value)
+        except InvalidStateError:
+            pass
+    
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of a list of latencies, in microseconds"""
+    ordered = sorted(samples)
+    return {f"p{p}": round(ordered[min(len(ordered) - 1,
+                                       len(ordered) * p // 100)] * 1e6, 2)
+            for p in points}
+
+def benchmark_predict_latency(n=20000, batch_size=256):
+    """Latency percentiles for predict, predict_batch and MicroBatcher
+    
+    Each path gets its own classifier with a cold cache, so none of them
+    runs on entries another path already computed. predict_batch reports
+    batch time divided by batch size: throughput, not what a caller waits.
+    """
+    texts = [" ".join(["word"] * (i % 12)) + f" doc{i % 5000}" for i in range(n)]
+    
+    def fresh_classifier():
+        return TextClassifier(LRUFeatureCache(capacity=n))
+    
+    classifier = fresh_classifier()
+    single = []
+    for text in texts:
+        start = time.perf_counter()
+        classifier.predict(text)
+        single.append(time.perf_counter() - start)
+    
+    classifier = fresh_classifier()
+    per_item = []
+    for i in range(0, n, batch_size):
+        batch = texts[i:i + batch_size]
+        start = time.perf_counter()
+        classifier.predict_batch(batch)
+        per_item.append((time.perf_counter() - start) / len(batch))
+    
+    batcher = MicroBatcher(fresh_classifier(), max_batch=batch_size)
+    submitted = []
+    for text in texts[:2000]:
+        submitted.append((time.perf_counter(), batcher.submit(text)))
+    queued = []
+    for start, future in submitted:
+        future.result()
+        queued.append(time.perf_counter() - start)
+    batcher.close()
+    
+    print(f"predict (per call):        {percentiles(single)}")
+    print(f"predict_batch (amortized per item, batch time / {batch_size}): "
+          f"{percentiles(per_item)}")
+    print(f"MicroBatcher (2000-request burst, end to end): {percentiles(queued)}")
 
 if __name__ == "__main__":
     profile_implementations()
@@ -87,3 +803,6 @@ if __name__ == "__main__":
     pipeline.load_data([1, 2, 3, 4, 5])
     pipeline.preprocess()
     print(f"Mean: {pipeline.evaluate()}")
+    print("Checkpoint keys stable across hash seeds:", check_fingerprint_stable())
+    benchmark_predict_latency()
+    benchmark_parallel_pipeline()
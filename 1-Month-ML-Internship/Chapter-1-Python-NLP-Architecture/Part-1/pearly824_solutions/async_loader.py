@@ -0,0 +1,107 @@
+# Concurrent file loading with asyncio
+#
+# Reading many small files one after another waits on every open/read
+# in turn, which dominates on network filesystems. aload_files keeps up
+# to `concurrency` blocking reads running in a thread pool and yields
+# (path, text) as each one finishes, so only the files in flight are in
+# memory. iter_files is the same thing as a plain iterator, so it can be
+# passed straight to WordFrequencyEngine.process_texts or as the source
+# of Pipeline.load_data.
+
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from exercise6_word_frequency_engine import WordFrequencyEngine, read_text_file
+
+
+async def aload_files(paths, concurrency=32, read=read_text_file, executor=None):
+    """Yield (path, text) in completion order, at most concurrency reads at once.
+
+    read defaults to read_text_file (utf-8, falling back to latin-1).
+    paths may be a lazy iterable; it is consumed as slots free up.
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    paths = iter(paths)
+    pending = {}
+
+    def submit():
+        for path in islice(paths, concurrency - len(pending)):
+            pending[loop.run_in_executor(executor, read, path)] = path
+
+    try:
+        submit()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished = [(pending.pop(future), future) for future in done]
+            submit()  # refill before handing results out
+            for path, future in finished:
+                yield path, future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_files(paths, concurrency=32, read=read_text_file):
+    """Synchronous iterator over aload_files, for non-async callers."""
+    loop = asyncio.new_event_loop()
+    files = aload_files(paths, concurrency, read)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(files.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(files.aclose())
+        loop.close()
+
+
+def benchmark(n_files=300, latency=0.005, concurrency=32):
+    """Sequential reads vs iter_files, with a simulated per-file latency."""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(n_files):
+            path = os.path.join(tmp, f"doc{i}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"document {i} python is fun and python is fast\n" * 20)
+            paths.append(path)
+
+        def slow_read(path):
+            time.sleep(latency)  # stand-in for a network filesystem round trip
+            return read_text_file(path)
+
+        sequential = WordFrequencyEngine(min_word_length=3)
+        start = time.perf_counter()
+        sequential.process_texts((path, slow_read(path)) for path in paths)
+        sequential_time = time.perf_counter() - start
+
+        concurrent = WordFrequencyEngine(min_word_length=3)
+        start = time.perf_counter()
+        concurrent.process_texts(iter_files(paths, concurrency, read=slow_read))
+        concurrent_time = time.perf_counter() - start
+
+        assert concurrent.top_n_words(5) == sequential.top_n_words(5)
+        print(f"{n_files} files, {latency * 1000:.0f} ms latency each:")
+        print(f"  sequential:        {sequential_time:.2f}s")
+        print(f"  iter_files (x{concurrency}): {concurrent_time:.2f}s "
+              f"({sequential_time / concurrent_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    async def main(paths):
+        async for path, text in aload_files(paths, concurrency=4):
+            print(f"{os.path.basename(path)}: {len(text)} characters")
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    asyncio.run(main(sorted(os.path.join(here, name) for name in os.listdir(here)
+                            if name.endswith(".py"))))
+    benchmark()
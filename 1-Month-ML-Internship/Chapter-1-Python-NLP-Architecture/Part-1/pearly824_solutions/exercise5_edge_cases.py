@@ -1,5 +1,6 @@
 # Exercise 5: Edge Case Handling
 
+import codecs
 import math
 
 
@@ -22,15 +23,23 @@ print("Exercise 5.2:", remove_accents(text_unicode))
 
 
 # Exercise 5.3: Safe file reading with encoding fallback
+# The file is read once; each encoding is tried on the bytes in memory.
+# A UTF-8 BOM is skipped. latin-1 maps every byte, so it always succeeds.
 def read_text_safe(filepath, encoding='utf-8'):
-    encodings_to_try = ['utf-8', 'latin-1', 'cp1252']
+    encodings_to_try = [encoding] + [e for e in ['utf-8', 'latin-1', 'cp1252'] if e != encoding]
+    
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
     
     for enc in encodings_to_try:
         try:
-            with open(filepath, 'r', encoding=enc) as f:
-                return f.read()
+            text = data.decode(enc)
         except UnicodeDecodeError:
             continue
+        # same newline handling as open(..., 'r')
+        return text.replace('\r\n', '\n').replace('\r', '\n')
     
     raise ValueError("File could not be decoded with supported encodings.")
 
@@ -1,9 +1,355 @@
 # Exercise 6: Capstone - Word Frequency Engine
 
+import heapq
 import json
 import math
-from functools import reduce
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 1 << 20  # characters per read in streaming mode
+
+# Binary format: header, then 8-byte aligned sections in this order
+BINARY_MAGIC = b"WFE1"
+BINARY_SECTIONS = ("word_offsets", "word_blob", "name_offsets", "name_blob",
+                   "row_offsets", "ids", "counts", "totals")
+_HEADER = struct.Struct("<4sIIIQ" + "Q" * len(BINARY_SECTIONS))
+
+
+def read_text_file(filepath):
+    """Read a file as utf-8, falling back to latin-1."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(filepath, 'r', encoding='latin-1') as f:
+            return f.read()
+
+
+def _count_shard(min_word_length, shard, chunk_size=None):
+    """Worker: analyze one shard of files and time it."""
+    engine = WordFrequencyEngine(min_word_length=min_word_length)
+    start = time.perf_counter()
+    counts = {}
+    total_bytes = 0
+    for filepath in shard:
+        total_bytes += os.path.getsize(filepath)
+        if chunk_size:
+            counts[filepath] = engine.analyze_file_streaming(filepath, chunk_size)
+        else:
+            counts[filepath] = engine.analyze_text(read_text_file(filepath))
+    elapsed = time.perf_counter() - start
+    stats = {
+        "pid": os.getpid(),
+        "files": len(shard),
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 4),
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else 0.0
+    }
+    return counts, stats
+
+
+def _tree_merge(partials):
+    """Merge partial results pairwise until one remains."""
+    if not partials:
+        return {}
+    while len(partials) > 1:
+        merged = []
+        for i in range(0, len(partials) - 1, 2):
+            left, right = partials[i], partials[i + 1]
+            left.update(right)
+            merged.append(left)
+        if len(partials) % 2:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0]
+
+
+class CompactVocabulary(Mapping):
+    """
+    Read-only word -> count view over two parallel arrays.
+
+    Words are stored as term ids into the shared vocabulary table,
+    sorted so lookups can bisect.
+    """
+
+    __slots__ = ("ids", "counts", "_table")
+
+    def __init__(self, ids, counts, table):
+        self.ids = ids          # array('I') of term ids, ascending
+        self.counts = counts    # array('I') of counts, same order
+        self._table = table     # the owning VocabularyIndex
+
+    def __getitem__(self, word):
+        term_id = self._table.word_ids[word]
+        pos = bisect_left(self.ids, term_id)
+        if pos == len(self.ids) or self.ids[pos] != term_id:
+            raise KeyError(word)
+        return self.counts[pos]
+
+    def __iter__(self):
+        words = self._table.words
+        return (words[i] for i in self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def items(self):
+        words = self._table.words
+        return [(words[i], c) for i, c in zip(self.ids, self.counts)]
+
+    def __repr__(self):
+        return f"CompactVocabulary({dict(self.items())})"
+
+    def __reduce__(self):
+        # Term ids only mean something inside the owning table, so
+        # copies and pickles are plain word -> count dicts
+        return (dict, (dict(self.items()),))
+
+
+class VocabularyIndex(MutableMapping):
+    """
+    Per-file vocabularies that keep a running global word count.
+
+    Every word is interned once in a global table; each file stores only
+    term-id and count arrays (see CompactVocabulary).
+    Counts are bucketed by frequency (count -> words), so top-N and
+    min/max only walk the distinct counts instead of sorting every word.
+    Replace a file's vocabulary by assigning it again; it keeps its
+    position. Copies and pickles are rebuilt from plain dicts.
+    """
+
+    def __init__(self, vocabularies=None):
+        self._vocabs = {}                 # file name -> CompactVocabulary
+        self.word_ids = {}                # word -> term id
+        self.words = []                   # term id -> word
+        self.totals = {}                  # word -> count across all files
+        self.buckets = defaultdict(dict)  # count -> words (ordered set)
+        self.grand_total = 0
+        self._top_cache = []
+        self._top_complete = False  # cache holds every word
+        if vocabularies:
+            self.update(vocabularies)
+
+    def __getitem__(self, key):
+        return self._vocabs[key]
+
+    def __iter__(self):
+        return iter(self._vocabs)
+
+    def __len__(self):
+        return len(self._vocabs)
+
+    def __contains__(self, key):
+        return key in self._vocabs
+
+    def __repr__(self):
+        return f"VocabularyIndex({self._vocabs!r})"
+
+    def _bump(self, word, delta):
+        if not delta:
+            return
+        old = self.totals.get(word, 0)
+        new = old + delta
+        if old:
+            del self.buckets[old][word]
+            if not self.buckets[old]:
+                del self.buckets[old]
+        if new:
+            self.totals[word] = new
+            self.buckets[new][word] = None
+        else:
+            del self.totals[word]
+        self.grand_total += delta
+
+    def _intern(self, word):
+        term_id = self.word_ids.get(word)
+        if term_id is None:
+            term_id = len(self.words)
+            word = sys.intern(word)
+            self.word_ids[word] = term_id
+            self.words.append(word)
+        return term_id
+
+    def _invalidate_top(self):
+        self._top_cache = []
+        self._top_complete = False
+
+    def __setitem__(self, key, vocab):
+        pairs = sorted((self._intern(word), count) for word, count in vocab.items())
+        ids = array('I', [term_id for term_id, _ in pairs])
+        counts = array('I', [count for _, count in pairs])
+        compact = CompactVocabulary(ids, counts, self)
+        old = self._vocabs.get(key)
+        if old is not None:
+            for word, count in old.items():
+                self._bump(word, -count)
+        self._vocabs[key] = compact  # same position if the key existed
+        for word, count in compact.items():
+            self._bump(word, count)
+        self._invalidate_top()
+
+    def __delitem__(self, key):
+        vocab = self._vocabs.pop(key)
+        for word, count in vocab.items():
+            self._bump(word, -count)
+        self._invalidate_top()
+
+    def popitem(self):
+        """Remove the most recently added file, like dict.popitem."""
+        if not self._vocabs:
+            raise KeyError("popitem(): dictionary is empty")
+        key = next(reversed(self._vocabs))
+        return key, self.pop(key)
+
+    def as_dicts(self):
+        """Plain {file name: {word: count}} copy."""
+        return {name: dict(vocab.items()) for name, vocab in self._vocabs.items()}
+
+    def __reduce__(self):
+        return (VocabularyIndex, (self.as_dicts(),))
+
+    def copy(self):
+        return VocabularyIndex(self.as_dicts())
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        new = self.copy()
+        new.update(other)
+        return new
+
+    def clear(self):
+        self.__init__()
+
+    def top_n(self, n):
+        """Top N (word, count) pairs, cached until the next change.
+
+        Ties are in first-seen (term id) order, like a stable sort of
+        the combined counts.
+        """
+        if len(self._top_cache) < n and not self._top_complete:
+            top = []
+            for count in sorted(self.buckets, reverse=True):
+                tied = heapq.nsmallest(n - len(top), self.buckets[count],
+                                       key=self.word_ids.__getitem__)
+                top.extend((word, count) for word in tied)
+                if len(top) == n:
+                    break
+            self._top_cache = top
+            self._top_complete = len(top) < n
+        return self._top_cache[:n]
+
+    def frequency_range(self):
+        """(min, max) of the global counts."""
+        return min(self.buckets), max(self.buckets)
+
+    def memory_report(self):
+        """Bytes used by the compact storage vs. one dict per file."""
+        compact = sys.getsizeof(self.word_ids) + sys.getsizeof(self.words)
+        compact += sum(sys.getsizeof(word) for word in self.words)
+        as_dicts = 0
+        for vocab in self.values():
+            compact += sys.getsizeof(vocab.ids) + sys.getsizeof(vocab.counts)
+            as_dict = dict(vocab.items())
+            as_dicts += sys.getsizeof(as_dict)
+            # Each per-file dict holds its own key strings and int objects
+            as_dicts += sum(sys.getsizeof(w) + sys.getsizeof(c)
+                            for w, c in as_dict.items())
+        return {"dict_bytes": as_dicts, "compact_bytes": compact}
+
+
+def _string_table(strings):
+    """utf-8 blob plus an offsets array with len(strings) + 1 entries."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = array('Q', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return offsets, b"".join(encoded)
+
+
+class MappedVocabularies:
+    """
+    Read-only, memory-mapped view of a file written by save_binary.
+
+    Layout (native little-endian arrays):
+      word_offsets/word_blob  - interned vocabulary table
+      name_offsets/name_blob  - file names
+      row_offsets/ids/counts  - CSR matrix, one row per file
+      totals                  - global count per term id
+    Queries only touch the sections they need.
+    """
+
+    def __init__(self, filepath):
+        self._file = open(filepath, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._mm, 0)
+        magic, self.min_word_length, self.n_words, self.n_files, nnz = header[:5]
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{filepath} is not a word frequency binary file")
+        starts = dict(zip(BINARY_SECTIONS, header[5:]))
+        view = memoryview(self._mm)
+
+        def section(name, fmt, length):
+            start = starts[name]
+            size = struct.calcsize(fmt)
+            return view[start:start + length * size].cast(fmt)
+
+        self._word_offsets = section("word_offsets", 'Q', self.n_words + 1)
+        self._name_offsets = section("name_offsets", 'Q', self.n_files + 1)
+        self._row_offsets = section("row_offsets", 'Q', self.n_files + 1)
+        self._ids = section("ids", 'I', nnz)
+        self._counts = section("counts", 'I', nnz)
+        self._totals = section("totals", 'Q', self.n_words)
+        self._word_blob = starts["word_blob"]
+        self._name_blob = starts["name_blob"]
+        self._views = [view, self._word_offsets, self._name_offsets,
+                       self._row_offsets, self._ids, self._counts, self._totals]
+
+    def _string(self, offsets, blob, i):
+        return self._mm[blob + offsets[i]:blob + offsets[i + 1]].decode('utf-8')
+
+    def word(self, term_id):
+        return self._string(self._word_offsets, self._word_blob, term_id)
+
+    def file_names(self):
+        return [self._string(self._name_offsets, self._name_blob, i)
+                for i in range(self.n_files)]
+
+    def file_vocabulary(self, index):
+        """Decode one CSR row into a word -> count dict."""
+        start, end = self._row_offsets[index], self._row_offsets[index + 1]
+        return {self.word(term_id): count
+                for term_id, count in zip(self._ids[start:end],
+                                          self._counts[start:end])}
+
+    def top_n_words(self, n=10):
+        """Top N words, reading only the totals and N vocabulary entries."""
+        top = heapq.nlargest(n, range(self.n_words),
+                             key=self._totals.__getitem__)
+        return [(self.word(i), self._totals[i]) for i in top
+                if self._totals[i]]
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 class WordFrequencyEngine:
@@ -13,7 +359,7 @@ class WordFrequencyEngine:
 
     def __init__(self, min_word_length=2):
         self.min_word_length = min_word_length
-        self.vocabularies = {}  # Stores frequencies per file
+        self.vocabularies = VocabularyIndex()  # Stores frequencies per file
 
     def clean_text(self, text):
         """Normalize whitespace and lowercase text."""
@@ -36,44 +382,94 @@ class WordFrequencyEngine:
         tokens = self.tokenize(cleaned)
         return self.count_frequencies(tokens)
 
-    def process_multiple_files(self, file_list):
-        """Read and analyze multiple text files safely."""
+    def _stream_counts(self, filepath, encoding, chunk_size):
+        """Count words chunk by chunk, carrying split tokens forward."""
+        freq = defaultdict(int)
+        carry = ""
+        with open(filepath, 'r', encoding=encoding) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = carry + chunk
+                words = chunk.split()
+                # A chunk ending mid-word continues in the next chunk. The
+                # fragment is carried raw: lowercasing depends on the whole
+                # word (Greek final sigma), so only complete words are lowered
+                carry = words.pop() if words and not chunk[-1].isspace() else ""
+                for word in " ".join(words).lower().split():
+                    if len(word) >= self.min_word_length:
+                        freq[word] += 1
+        for word in carry.lower().split():
+            if len(word) >= self.min_word_length:
+                freq[word] += 1
+        return dict(freq)
+
+    def analyze_file_streaming(self, filepath, chunk_size=CHUNK_SIZE):
+        """Same result as analyze_text, with bounded memory per file."""
+        try:
+            return self._stream_counts(filepath, 'utf-8', chunk_size)
+        except UnicodeDecodeError:
+            return self._stream_counts(filepath, 'latin-1', chunk_size)
+
+    def process_multiple_files(self, file_list, workers=1, chunk_size=None):
+        """Read and analyze multiple text files safely.
+
+        With workers > 1 the file list is sharded across a process pool,
+        each shard is counted locally and the partial results are merged
+        in a tree reduction. Returns per-worker throughput stats.
+        Passing chunk_size streams each file instead of reading it whole.
+        """
+        file_list = list(file_list)
+        if workers <= 1 or len(file_list) < 2:
+            counts, stats = _count_shard(self.min_word_length, file_list,
+                                         chunk_size)
+            self.vocabularies.update(counts)
+            return [stats]
+
+        shards = [file_list[i::workers] for i in range(workers)]
+        shards = [shard for shard in shards if shard]
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            results = list(pool.map(_count_shard,
+                                    [self.min_word_length] * len(shards),
+                                    shards,
+                                    [chunk_size] * len(shards)))
+
+        merged = _tree_merge([counts for counts, _ in results])
+        # Keep the input order so results match the sequential path
         for filepath in file_list:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    text = f.read()
-            except UnicodeDecodeError:
-                with open(filepath, 'r', encoding='latin-1') as f:
-                    text = f.read()
+            self.vocabularies[filepath] = merged[filepath]
+        return [stats for _, stats in results]
+
+    def process_texts(self, texts):
+        """Analyze (filepath, text) pairs as they arrive.
 
+        texts can be any iterable, e.g. async_loader.iter_files(paths);
+        nothing is collected first. Returns the number of files.
+        """
+        n_files = 0
+        for filepath, text in texts:
             self.vocabularies[filepath] = self.analyze_text(text)
+            n_files += 1
+        return n_files
+
+    def remove_file(self, filepath):
+        """Drop one file's counts from the engine."""
+        del self.vocabularies[filepath]
 
     def top_n_words(self, n=10):
         """Return top N words across all vocabularies."""
-        combined = defaultdict(int)
-
-        for vocab in self.vocabularies.values():
-            for word, count in vocab.items():
-                combined[word] += count
-
-        return sorted(combined.items(), key=lambda x: x[1], reverse=True)[:n]
+        return self.vocabularies.top_n(n)
 
     def calculate_statistics(self):
         """Calculate min, max, mean frequency."""
-        combined = defaultdict(int)
-
-        for vocab in self.vocabularies.values():
-            for word, count in vocab.items():
-                combined[word] += count
+        totals = self.vocabularies.totals
 
-        if not combined:
+        if not totals:
             return {"min": 0, "max": 0, "mean": 0}
 
-        values = list(combined.values())
-
-        min_freq = min(values)
-        max_freq = max(values)
-        mean_freq = reduce(lambda a, b: a + b, values) / len(values)
+        min_freq, max_freq = self.vocabularies.frequency_range()
+        mean_freq = self.vocabularies.grand_total / len(totals)
 
         return {
             "min": min_freq,
@@ -88,7 +484,60 @@ class WordFrequencyEngine:
     def save_to_json(self, filepath):
         """Export vocabularies to JSON."""
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.vocabularies, f, indent=4)
+            json.dump({name: dict(vocab.items())
+                       for name, vocab in self.vocabularies.items()}, f, indent=4)
+
+    def export_jsonl(self, filepath):
+        """Stream one {"file": ..., "counts": {...}} object per line."""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for name, vocab in self.vocabularies.items():
+                f.write(json.dumps({"file": name, "counts": dict(vocab.items())}))
+                f.write("\n")
+
+    def save_binary(self, filepath):
+        """Write vocabularies in the columnar format read by MappedVocabularies."""
+        index = self.vocabularies
+        word_offsets, word_blob = _string_table(index.words)
+        name_offsets, name_blob = _string_table(index.keys())
+        row_offsets = array('Q', [0])
+        for vocab in index.values():
+            row_offsets.append(row_offsets[-1] + len(vocab))
+        totals = array('Q', [index.totals.get(word, 0) for word in index.words])
+
+        def write_column(f, column):
+            for vocab in index.values():
+                getattr(vocab, column).tofile(f)
+
+        writers = {
+            "word_offsets": lambda f: word_offsets.tofile(f),
+            "word_blob": lambda f: f.write(word_blob),
+            "name_offsets": lambda f: name_offsets.tofile(f),
+            "name_blob": lambda f: f.write(name_blob),
+            "row_offsets": lambda f: row_offsets.tofile(f),
+            "ids": lambda f: write_column(f, "ids"),
+            "counts": lambda f: write_column(f, "counts"),
+            "totals": lambda f: totals.tofile(f),
+        }
+        starts = []
+        with open(filepath, 'wb') as f:
+            f.write(b"\0" * _HEADER.size)
+            for name in BINARY_SECTIONS:
+                f.write(b"\0" * (-f.tell() % 8))
+                starts.append(f.tell())
+                writers[name](f)
+            f.seek(0)
+            f.write(_HEADER.pack(BINARY_MAGIC, self.min_word_length,
+                                 len(index.words), len(index),
+                                 row_offsets[-1], *starts))
+
+    @classmethod
+    def load_binary(cls, filepath):
+        """Rebuild an engine from a save_binary file."""
+        with MappedVocabularies(filepath) as mapped:
+            engine = cls(min_word_length=mapped.min_word_length)
+            for i, name in enumerate(mapped.file_names()):
+                engine.vocabularies[name] = mapped.file_vocabulary(i)
+        return engine
 
 
 # Example Usage (Safe Demo)
@@ -102,5 +551,6 @@ if __name__ == "__main__":
 
     print("Top words:", engine.top_n_words(5))
     print("Statistics:", engine.get_statistics())
+    print("Memory:", engine.vocabularies.memory_report())
 
     engine.save_to_json("output.json")
\ No newline at end of file
@@ -0,0 +1,148 @@
+# Similarity search over document vectors
+#
+# Replaces brute-force cosine_similarity loops with an index of
+# pre-normalized vectors. Two search modes:
+#   exact - blocked matrix multiply over every stored vector
+#   lsh   - random-projection LSH: vectors are bucketed by the sign
+#           pattern of a few random hyperplanes per table; a query only
+#           scores vectors that share a bucket in some table
+
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from vector_math import normalize_rows
+
+
+class SimilarityIndex:
+    """Cosine-similarity index with incremental inserts and top-k queries."""
+
+    def __init__(self, dim, n_tables=8, n_bits=12, block_size=65536, seed=0):
+        self.dim = dim
+        self.block_size = block_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_bits, dim))
+        self.bit_weights = 1 << np.arange(n_bits, dtype=np.int64)
+        self._buffer = np.empty((0, dim))  # unit vectors; capacity doubles as it fills
+        self.ids = []
+        self.tables = [defaultdict(list) for _ in range(n_tables)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def vectors(self):
+        """All stored unit vectors (a view of the buffer, no copy)."""
+        return self._buffer[:len(self.ids)]
+
+    def _hashes(self, unit):
+        """Bucket key of each row in each table, shape (n_tables, n_rows)."""
+        # Projections are float64 (n_tables, rows, n_bits); hashing a block
+        # of rows at a time keeps that bounded for large add() batches
+        return np.concatenate([
+            (np.einsum('tbd,nd->tnb', self.planes, unit[i:i + self.block_size]) > 0)
+            @ self.bit_weights
+            for i in range(0, len(unit), self.block_size)
+        ] or [np.empty((len(self.planes), 0), dtype=self.bit_weights.dtype)], axis=1)
+
+    def add(self, vectors, ids=None):
+        """Insert vectors; ids default to their insertion position."""
+        unit = normalize_rows(np.atleast_2d(vectors))
+        if unit.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}")
+        self._insert(unit, ids)
+
+    def _insert(self, unit, ids):
+        start = len(self.ids)
+        if ids is None:
+            ids = range(start, start + len(unit))
+        end = start + len(unit)
+        if end > len(self._buffer):
+            # Amortized O(1) per row: copy only when capacity doubles
+            grown = np.empty((max(end, 2 * len(self._buffer), 16), self.dim))
+            grown[:start] = self._buffer[:start]
+            self._buffer = grown
+        self._buffer[start:end] = unit
+        self.ids.extend(ids)
+        for table, keys in zip(self.tables, self._hashes(unit)):
+            for row, key in enumerate(keys.tolist(), start):
+                table[key].append(row)
+
+    @staticmethod
+    def _top_k(scores, rows, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return [], []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return rows[best], scores[best]
+
+    def search(self, query, k=10, mode="exact"):
+        """Top-k (id, score) pairs for one query vector."""
+        query = normalize_rows(np.atleast_2d(query))[0]
+        vectors = self.vectors
+        if mode == "exact":
+            scores = np.concatenate([
+                vectors[i:i + self.block_size] @ query
+                for i in range(0, len(self.ids), self.block_size)
+            ] or [np.empty(0)])
+            rows = np.arange(len(self.ids))
+        elif mode == "lsh":
+            candidates = set()
+            for table, key in zip(self.tables, self._hashes(query[None, :])[:, 0]):
+                candidates.update(table.get(int(key), ()))
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            scores = vectors[rows] @ query
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+        top_rows, top_scores = self._top_k(scores, rows, k)
+        return [(self.ids[r], float(s)) for r, s in zip(top_rows, top_scores)]
+
+    def save(self, path):
+        """Write vectors, ids (ints or strings) and LSH settings to one .npz file."""
+        np.savez(path, vectors=self.vectors, ids=np.array(self.ids),
+                 planes=self.planes, block_size=self.block_size)
+
+    @classmethod
+    def load(cls, path):
+        """Rebuild an index from save(); the LSH tables are re-hashed."""
+        with np.load(path, allow_pickle=False) as data:
+            planes = data["planes"]
+            index = cls(planes.shape[2], n_tables=planes.shape[0],
+                        n_bits=planes.shape[1], block_size=int(data["block_size"]))
+            index.planes = planes
+            index._insert(data["vectors"], data["ids"].tolist())
+        return index
+
+
+def benchmark(n=100000, dim=128, n_queries=200, k=10):
+    """Recall@k and queries per second for each search mode."""
+    rng = np.random.default_rng(1)
+    # Clustered data, like document embeddings, so neighbours exist
+    centers = rng.standard_normal((n // 100, dim))
+    data = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim))
+    queries = data[rng.choice(n, n_queries, replace=False)] + 0.1 * rng.standard_normal((n_queries, dim))
+
+    index = SimilarityIndex(dim)
+    start = time.perf_counter()
+    index.add(data)
+    print(f"Indexed {n:,} x {dim} in {time.perf_counter() - start:.2f}s")
+
+    truth = None
+    for mode in ("exact", "lsh"):
+        start = time.perf_counter()
+        results = [[i for i, _ in index.search(q, k, mode)] for q in queries]
+        elapsed = time.perf_counter() - start
+        if truth is None:
+            truth = results
+        recall = np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)])
+        print(f"  {mode:>5}: recall@{k} = {recall:.3f}, {n_queries / elapsed:,.0f} QPS")
+
+
+if __name__ == "__main__":
+    index = SimilarityIndex(dim=3)
+    index.add([[1, 2, 3], [4, 5, 6], [-1, 0, 0], [0, 0, 0]], ids=["a", "b", "c", "zero"])
+    print("Top 2 for [1, 2, 3]:", index.search([1, 2, 3], k=2))
+    benchmark()
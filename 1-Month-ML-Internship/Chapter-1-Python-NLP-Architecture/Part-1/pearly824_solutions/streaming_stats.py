@@ -0,0 +1,169 @@
+# Single-pass streaming statistics
+#
+# One pass over any iterable gives count, mean, variance and std
+# (Welford's method), min and max, plus approximate median and
+# quantiles from a mergeable log-bucket sketch. Accumulators from
+# parallel workers combine with merge(), so nothing is held in memory
+# or sorted.
+
+import math
+from collections import defaultdict
+
+
+class QuantileSketch:
+    """Quantiles with bounded relative error (DDSketch-style buckets).
+
+    Each value x != 0 falls in bucket ceil(log_gamma(|x|)); a bucket is
+    reported as the value within relative_accuracy of everything in it.
+    Merging two sketches just adds their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = defaultdict(int)
+        self.negative = defaultdict(int)
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x > 0:
+            self.positive[math.ceil(math.log(x) / self.log_gamma)] += 1
+        elif x < 0:
+            self.negative[math.ceil(math.log(-x) / self.log_gamma)] += 1
+        else:
+            self.zeros += 1
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, n in other.positive.items():
+            self.positive[index] += n
+        for index, n in other.negative.items():
+            self.negative[index] += n
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+
+class StreamingStats:
+    """Mean, variance, std, min, max and quantiles in a single pass."""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.sketch.add(x)
+
+    def update(self, values):
+        """Consume any iterable, including generators."""
+        add = self.add
+        for x in values:
+            add(x)
+        return self
+
+    def merge(self, other):
+        """Combine with another accumulator (Chan et al. parallel update)."""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, as in exercise 4.5."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def sample_variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self):
+        return self.sketch.quantile(0.5)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "median": self.median,
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+def stats_of(values, relative_accuracy=0.01):
+    """Convenience: StreamingStats over one iterable."""
+    return StreamingStats(relative_accuracy).update(values)
+
+
+if __name__ == "__main__":
+    scores = [78, 85, 92, 88, 76, 95, 89]
+    summary = stats_of(scores).summary()
+    print("Exercise 4.5, streaming:")
+    for key in ("mean", "median", "variance", "std"):
+        print(f"{key} =", round(summary[key], 2))
+
+    # Two workers each see half of a stream; merge gives the full result
+    left = stats_of(x * 0.5 for x in range(500000))
+    right = stats_of(x * 0.5 for x in range(500000, 1000000))
+    merged = left.merge(right)
+    print("Merged stream:", {k: round(v, 2) for k, v in merged.summary().items()})